@@ -1,33 +1,46 @@
 import os
+import enum
+import functools
+import hashlib
 import gradio as gr
 import google.generativeai as genai
 from dotenv import load_dotenv
 import asyncio
-from playwright.async_api import async_playwright
-import json
-
-# Load environment variables from .env file
+import atexit
+import collections
+import io
+import re
+import sqlite3
+import time
+from playwright.async_api import async_playwright, Error as PlaywrightError
+import msgspec
+from urllib.parse import urlparse
+from typing import Union
+from typing_extensions import TypedDict
+
+try:
+    import uvloop
+except ImportError:  # uvloop does not support Windows
+    pass
+else:
+    # libuv-based loop for the many small CDP socket reads/writes Playwright makes.
+    uvloop.install()
+
+# Load environment variables from .env file and configure Gemini once, so a
+# missing key stops the app at startup rather than on the first command.
 load_dotenv()
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+if not GEMINI_API_KEY:
+    raise ValueError(
+        "Gemini API key not found. Please set it in the .env file.")
+genai.configure(api_key=GEMINI_API_KEY)
 
 # --- 1. Natural Language Processing Module (Gemini) ---
 
 
-def configure_nlp_module():
-    """Configures and returns the Gemini model instance."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError(
-            "Gemini API key not found. Please set it in the .env file.")
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash-latest')
-    return model
-
+DEFAULT_MODEL_NAME = 'gemini-1.5-flash-latest'
 
-def generate_automation_plan(model, user_prompt):
-    """
-    Sends the user prompt to Gemini and asks for a structured automation plan.
-    """
-    structured_prompt = f"""
+PLANNER_INSTRUCTIONS = """
     You are an expert at converting user requests into a structured series of browser automation steps.
     Based on the user's request, provide a JSON array of actions to be executed by Playwright.
     
@@ -39,101 +52,600 @@ def generate_automation_plan(model, user_prompt):
     - "extract_text": Needs a "selector" and a "description" for what the text is.
     - "end": Signifies the end of the task and has a "message" parameter to show the user.
     
-    User Request: "{user_prompt}"
-    
     Provide only the JSON array as your response.
     """
 
-    response = model.generate_content(structured_prompt)
 
-    plan_text = response.text.strip().replace('```json', '').replace('```', '')
-    return plan_text
+class PlanAction(enum.Enum):
+    """The actions a plan step may use; constrains Gemini's output."""
+    NAVIGATE = "navigate"
+    CLICK = "click"
+    TYPE = "type"
+    EXTRACT_TEXT = "extract_text"
+    END = "end"
+
+
+class _PlanStepSchemaBase(TypedDict):
+    action: PlanAction
+
+
+class PlanStepSchema(_PlanStepSchemaBase, total=False):
+    """Response schema for one plan step, as sent to Gemini."""
+    url: str
+    selector: str
+    text: str
+    description: str
+    message: str
+
+
+# Gemini returns the plan as JSON matching this schema, so no fence stripping
+# or prose cleanup is needed before decoding it.
+PLAN_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json", response_schema=list[PlanStepSchema])
+
+
+# Validated plan steps. The plan is decoded straight into these structs, with
+# the "action" field selecting the step type.
+
+class ActionStep(msgspec.Struct, tag_field="action"):
+    """Base class for a validated plan step."""
+
+
+class Navigate(ActionStep, tag="navigate"):
+    url: str
+
+
+class Click(ActionStep, tag="click"):
+    selector: str
+
+
+class TypeText(ActionStep, tag="type"):
+    selector: str
+    text: str
+
+
+class ExtractText(ActionStep, tag="extract_text"):
+    selector: str
+    description: str = ""
+
+
+class End(ActionStep, tag="end"):
+    message: str = ""
+
+
+Plan = list[Union[Navigate, Click, TypeText, ExtractText, End]]
+
+
+def decode_plan(plan_json_str):
+    """Parses and validates a plan, raising msgspec.DecodeError if it is malformed."""
+    return msgspec.json.decode(plan_json_str, type=Plan)
+
+
+@functools.lru_cache(maxsize=8)
+def configure_nlp_module(model_name=DEFAULT_MODEL_NAME):
+    """
+    Returns the Gemini model instance for `model_name`.
+
+    One instance is cached per model, so users on different models do not keep
+    rebuilding each other's. The static planner instructions are sent as the
+    system instruction, ahead of the request, so the provider's implicit prefix
+    caching can reuse them.
+    """
+    model = genai.GenerativeModel(model_name, system_instruction=PLANNER_INSTRUCTIONS)
+    return model
+
+
+async def generate_automation_plan(model, user_prompt):
+    """
+    Sends the user prompt to Gemini and streams back the structured automation
+    plan as it is generated.
+    """
+    # The planner instructions are the model's system instruction, so the user request is the only dynamic text and comes last.
+    structured_prompt = f'User Request: "{user_prompt}"'
+
+    response = await model.generate_content_async(
+        structured_prompt, generation_config=PLAN_GENERATION_CONFIG, stream=True)
+    async for chunk in response:
+        yield chunk.text
+
+
+# --- Plan cache ---
+# Plans that ran successfully are keyed by model and normalised prompt so
+# repeated commands skip the Gemini round-trip. Recent plans are kept in memory
+# and also persisted to SQLite so hits survive restarts. The cache is
+# best-effort: storage errors are ignored and the plan is simply regenerated.
+
+PLAN_CACHE_PATH = os.getenv("BRAIN_PLAN_CACHE", "plan_cache.sqlite3")
+PLAN_CACHE_SIZE = 256
+PLAN_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# Changes to the planner instructions or the plan schema change the version,
+# so plans generated for an older prompt are never replayed.
+PLAN_CACHE_VERSION = hashlib.sha256(
+    PLANNER_INSTRUCTIONS.encode() + msgspec.json.encode(msgspec.json.schema(Plan))).hexdigest()[:16]
+_plan_cache = collections.OrderedDict()
+
+
+def _plan_cache_key(model_name, user_prompt):
+    return f"{PLAN_CACHE_VERSION}:{model_name}:{' '.join(user_prompt.split()).lower()}"
+
+
+@functools.lru_cache(maxsize=1)
+def _plan_cache_db():
+    db = sqlite3.connect(PLAN_CACHE_PATH, check_same_thread=False)
+    db.execute("CREATE TABLE IF NOT EXISTS plan_cache "
+               "(key TEXT PRIMARY KEY, plan TEXT NOT NULL, created_at REAL NOT NULL)")
+    return db
+
+
+def _remember_plan(key, plan_json_str, created_at):
+    _plan_cache[key] = (plan_json_str, created_at)
+    _plan_cache.move_to_end(key)
+    if len(_plan_cache) > PLAN_CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+
+
+def _forget_plan(key):
+    _plan_cache.pop(key, None)
+    try:
+        db = _plan_cache_db()
+        with db:
+            db.execute("DELETE FROM plan_cache WHERE key = ?", (key,))
+    except sqlite3.Error:
+        pass
+
+
+def get_cached_plan(model_name, user_prompt):
+    """Returns a previously successful plan for this prompt, or None."""
+    key = _plan_cache_key(model_name, user_prompt)
+    if key in _plan_cache:
+        _plan_cache.move_to_end(key)
+        plan_json_str, created_at = _plan_cache[key]
+    else:
+        try:
+            row = _plan_cache_db().execute(
+                "SELECT plan, created_at FROM plan_cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        plan_json_str, created_at = row
+        _remember_plan(key, plan_json_str, created_at)
+    if time.time() - created_at > PLAN_CACHE_TTL_SECONDS:
+        _forget_plan(key)
+        return None
+    return plan_json_str
+
+
+def store_plan(model_name, user_prompt, plan_json_str):
+    """Caches a plan that ran without errors."""
+    key = _plan_cache_key(model_name, user_prompt)
+    created_at = time.time()
+    _remember_plan(key, plan_json_str, created_at)
+    try:
+        db = _plan_cache_db()
+        with db:
+            db.execute("INSERT OR REPLACE INTO plan_cache (key, plan, created_at) VALUES (?, ?, ?)",
+                       (key, plan_json_str, created_at))
+            # Keep the disk cache within the same age and size limits as memory.
+            db.execute("DELETE FROM plan_cache WHERE created_at < ?",
+                       (created_at - PLAN_CACHE_TTL_SECONDS,))
+            db.execute("DELETE FROM plan_cache WHERE key NOT IN "
+                       "(SELECT key FROM plan_cache ORDER BY created_at DESC LIMIT ?)",
+                       (PLAN_CACHE_SIZE,))
+    except sqlite3.Error:
+        pass
+
+
+def evict_plan(model_name, user_prompt):
+    """Drops a cached plan that failed, so the next run asks Gemini again."""
+    _forget_plan(_plan_cache_key(model_name, user_prompt))
 
 # --- 2. Web Automation Module (Playwright) ---
+# Browsers are kept alive for the lifetime of the app and runs borrow
+# contexts from a small pool, so the browser startup cost is only paid once.
+# There is one browser per headless mode, so users with different settings on
+# a shared link never close each other's browser.
+
+BROWSER_ARGS = ["--disable-dev-shm-usage", "--no-sandbox"]
+
+_playwright = None
+_browsers = {}
+_browser_loop = None
+_browser_lock = asyncio.Lock()
+
+
+async def get_browser(headless=True):
+    """Returns the shared browser for the headless mode, launching it on first use."""
+    global _playwright, _browser_loop
+    async with _browser_lock:
+        browser = _browsers.get(headless)
+        if browser is None or not browser.is_connected():
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            browser = _browsers[headless] = await _playwright.chromium.launch(
+                headless=headless, args=BROWSER_ARGS)
+            _browser_loop = asyncio.get_running_loop()
+    return browser
+
+
+async def shutdown_browser():
+    """Closes the shared browsers and stops Playwright."""
+    global _playwright
+    _context_pools.clear()
+    for browser in _browsers.values():
+        await browser.close()
+    _browsers.clear()
+    if _playwright:
+        await _playwright.stop()
+        _playwright = None
+
+
+@atexit.register
+def _shutdown_browser_at_exit():
+    # Playwright objects belong to the loop that created them. If that loop has
+    # already stopped, the driver process exits together with this one.
+    if _browser_loop is None or not _browser_loop.is_running():
+        return
+    future = asyncio.run_coroutine_threadsafe(shutdown_browser(), _browser_loop)
+    try:
+        future.result(timeout=10)
+    except Exception:
+        pass
+
+
+# Locators keyed by (id(page), selector), so a selector used more than once on
+# a page is only built once. Entries are dropped when the page's context closes.
+locator_cache = {}
 
 
-async def execute_playwright_plan(plan):
+def get_locator(page, selector):
+    """Returns the cached Locator for `selector` on `page`."""
+    key = (id(page), selector)
+    locator = locator_cache.get(key)
+    if locator is None:
+        locator = locator_cache[key] = page.locator(selector)
+    return locator
+
+
+def forget_locators(pages):
+    """Drops cached Locators belonging to `pages`."""
+    page_ids = {id(page) for page in pages}
+    for key in [key for key in locator_cache if key[0] in page_ids]:
+        del locator_cache[key]
+
+
+# Text extraction with plain "#id" and "[attr=value]" selectors uses a single
+# evaluate call instead of the Locator machinery. The Locator is still used
+# when the element is not on the page yet, so auto-waiting is kept for slow
+# pages. Clicks always go through the Locator: a synthetic el.click() skips
+# actionability checks, and retrying one after an evaluate error can click twice.
+_ID_SELECTOR = re.compile(r'^#[\w-]+$')
+_ATTR_SELECTOR = re.compile(r"""^\[[\w-]+=(?:"[^"\\]*"|'[^'\\]*'|[\w-]+)\]$""")
+
+_FAST_INNER_TEXT_JS = {
+    "id": "(id) => document.getElementById(id)?.innerText ?? null",
+    "attr": "(sel) => document.querySelector(sel)?.innerText ?? null",
+}
+
+
+def classify_selector(selector):
+    """Returns "id", "attr" or "complex" depending on the selector's form."""
+    if _ID_SELECTOR.match(selector):
+        return "id"
+    if _ATTR_SELECTOR.match(selector):
+        return "attr"
+    return "complex"
+
+
+async def _fast_inner_text(page, selector):
+    kind = classify_selector(selector)
+    if kind == "complex":
+        return None
+    try:
+        return await page.evaluate(
+            _FAST_INNER_TEXT_JS[kind], selector[1:] if kind == "id" else selector)
+    except PlaywrightError:
+        # e.g. the page navigated mid-evaluate; reading is safe to retry.
+        return None
+
+
+async def inner_text_of(page, selector):
+    """Returns the inner text of the element matching `selector`."""
+    text_content = await _fast_inner_text(page, selector)
+    if text_content is None:
+        text_content = await get_locator(page, selector).inner_text()
+    return text_content
+
+
+# Optionally, pre-warmed contexts are reused across runs. A run takes an idle
+# context if there is one and otherwise opens a new one, so runs never wait on
+# the pool. Reuse trades isolation for speed: cookies and permissions are
+# cleared between runs, but localStorage, IndexedDB, service workers and the
+# HTTP cache carry over to the next run, which may be another user's on a
+# shared link. The pool is therefore off (size 0) by default and every run gets
+# a fresh context. The size is a process-wide setting, read from
+# BRAIN_CONTEXT_POOL_SIZE, so concurrent sessions cannot resize it under each other.
+CONTEXT_POOL_SIZE = int(os.getenv("BRAIN_CONTEXT_POOL_SIZE", "0"))
+
+_context_pools = {}
+_context_pool_lock = asyncio.Lock()
+
+
+async def get_context_pool(browser):
     """
-    Executes the automation plan using Playwright and pauses at the end.
+    Returns the pool of idle contexts for `browser`, building it on first use,
+    or None when pooling is disabled.
+
+    Pools of browsers that have since disconnected are dropped.
     """
-    results = []
-    playwright = None
-    browser = None
+    if CONTEXT_POOL_SIZE <= 0:
+        return None
+    async with _context_pool_lock:
+        for stale in [b for b in _context_pools if not b.is_connected()]:
+            del _context_pools[stale]
+        pool = _context_pools.get(browser)
+        if pool is None:
+            pool = _context_pools[browser] = asyncio.Queue(maxsize=CONTEXT_POOL_SIZE)
+            for context in await asyncio.gather(
+                    *(browser.new_context() for _ in range(CONTEXT_POOL_SIZE))):
+                pool.put_nowait(context)
+    return pool
+
+
+async def acquire_context(browser):
+    """Takes an idle context from the pool, or opens a new one."""
+    pool = _context_pools.get(browser)
+    if pool is not None:
+        try:
+            return pool.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    return await browser.new_context()
+
+
+async def release_context(context):
+    """
+    Resets `context` and returns it to the pool, closing it if the pool is
+    full or belongs to a different browser.
+    """
+    pages = context.pages
+    forget_locators(pages)
+    pool = _context_pools.get(context.browser)
     try:
-        playwright = await async_playwright().start()
-        browser = await playwright.chromium.launch(headless=False)
-        page = await browser.new_page()
+        if pool is None or pool.full():
+            await context.close()
+            return
+        for page in pages:
+            await page.close()
+        await context.unroute_all(behavior="ignoreErrors")
+        await context.clear_cookies()
+        await context.clear_permissions()
+        pool.put_nowait(context)
+    except (PlaywrightError, asyncio.QueueFull):
+        # The browser may already be gone; don't let cleanup fail the run.
+        try:
+            await context.close()
+        except PlaywrightError:
+            pass
+
+
+# Resource types that are aborted by default; selectors and text only need the DOM.
+BLOCKABLE_RESOURCES = ["image", "media", "font", "stylesheet"]
+DEFAULT_BLOCKED_RESOURCES = ("image", "media", "font")
+ANALYTICS_HOSTS = ("google-analytics.com", "googletagmanager.com",
+                   "doubleclick.net", "connect.facebook.net", "hotjar.com", "segment.io")
+
+
+# Selectors are queryable once the DOM is parsed, so navigation does not wait
+# for every subresource to finish loading.
+WAIT_UNTIL_CHOICES = ["commit", "domcontentloaded", "load", "networkidle"]
+DEFAULT_WAIT_UNTIL = "domcontentloaded"
+NAVIGATION_TIMEOUT_MS = 15000
+
+
+def _is_analytics_url(url):
+    host = urlparse(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in ANALYTICS_HOSTS)
+
+
+def _make_route_handler(blocked_resources, block_analytics):
+    """Builds a route handler that aborts the given resource types."""
+    blocked_resources = frozenset(blocked_resources)
+
+    async def handle_route(route):
+        request = route.request
+        if request.resource_type in blocked_resources or (
+                block_analytics and request.resource_type == "script"
+                and _is_analytics_url(request.url)):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    return handle_route
+
+
+# Chains are keyed by registrable domain rather than full host, because
+# cookies such as a login are usually set on the parent domain and shared by
+# its subdomains (accounts.google.com -> mail.google.com). Without a public
+# suffix list this is a heuristic: the last two labels are kept, or three for
+# two-letter country TLDs with a common second level ("amazon.co.uk"). It errs
+# towards merging, so hosts that might share state stay in one chain.
+_COUNTRY_SECOND_LEVELS = {"co", "com", "org", "net", "ac", "gov", "edu"}
+
+
+def _url_site(url):
+    """Returns the registrable domain a navigation targets, e.g. "google.com"."""
+    url = url or ""
+    # Scheme-less URLs ("amazon.com/s", "localhost:3000") are parsed as hosts.
+    host = (urlparse(url if "//" in url else "//" + url).hostname or "").lower()
+    labels = host.split(".")
+    if host.replace(".", "").isdigit():
+        return host
+    if (len(labels) > 2 and len(labels[-1]) == 2
+            and labels[-2] in _COUNTRY_SECOND_LEVELS):
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def split_plan(plan):
+    """
+    Splits a plan into chains of steps that can run independently.
+
+    Steps are grouped by the site (registrable domain) they run on, since steps
+    on the same site may depend on state (cookies, typed input) left by earlier
+    ones. Returns the
+    chains in order of first appearance and the "end" step, if any.
+    """
+    chains = {}
+    site = None
+    for step in plan:
+        if isinstance(step, End):
+            return list(chains.values()), step
+        if isinstance(step, Navigate):
+            site = _url_site(step.url)
+        chains.setdefault(site, []).append(step)
+    return list(chains.values()), None
+
+
+# Step handlers, dispatched on the step's struct type. "end" steps never reach
+# a chain; split_plan stops at them.
+
+async def _do_navigate(page, step, results, wait_until=DEFAULT_WAIT_UNTIL):
+    await page.goto(step.url, wait_until=wait_until,
+                    timeout=NAVIGATION_TIMEOUT_MS)
+    results.write(f"Navigated to {step.url}\n")
+
+
+async def _do_type(page, step, results):
+    await get_locator(page, step.selector).type(step.text)
+    results.write(f"Typed '{step.text}' into '{step.selector}'\n")
 
-        for step in plan:
-            action = step.get("action")
 
-            if action == "navigate":
-                await page.goto(step.get("url"))
-                results.append(f"Navigated to {step.get('url')}")
+async def _do_click(page, step, results):
+    await get_locator(page, step.selector).click()
+    results.write(f"Clicked on '{step.selector}'\n")
 
-            elif action == "type":
-                await page.locator(step.get("selector")).type(step.get("text"))
-                results.append(
-                    f"Typed '{step.get('text')}' into '{step.get('selector')}'")
 
-            elif action == "click":
-                await page.locator(step.get("selector")).click()
-                results.append(f"Clicked on '{step.get('selector')}'")
+async def _do_extract_text(page, step, results):
+    text_content = await inner_text_of(page, step.selector)
+    results.write(f"Extracted Data ({step.description}): {text_content}\n")
 
-            elif action == "extract_text":
-                text_content = await page.locator(step.get("selector")).inner_text()
-                results.append(
-                    f"Extracted Data ({step.get('description')}): {text_content}")
 
-            elif action == "end":
-                results.append(f"Task finished: {step.get('message')}")
-                break
+HANDLERS = {
+    Navigate: _do_navigate,
+    TypeText: _do_type,
+    Click: _do_click,
+    ExtractText: _do_extract_text,
+}
 
-        results.append("\n✅ Automation finished. The browser is now paused.")
-        results.append(
-            "Close the browser window manually to run a new command.")
-        await page.pause()
+
+async def run_chain(browser, chain, blocked_resources=DEFAULT_BLOCKED_RESOURCES,
+                    wait_until=DEFAULT_WAIT_UNTIL):
+    """
+    Executes one chain of steps in its own browser context and returns
+    `(succeeded, log)`.
+
+    Requests for `blocked_resources` types are aborted. Analytics scripts are
+    also blocked for chains that only read pages, since click handlers on
+    some sites wait on them.
+    """
+    results = io.StringIO()
+    succeeded = False
+    context = None
+    try:
+        context = await acquire_context(browser)
+        block_analytics = all(isinstance(step, (Navigate, ExtractText))
+                              for step in chain)
+        if blocked_resources or block_analytics:
+            await context.route("**/*", _make_route_handler(blocked_resources, block_analytics))
+        page = await context.new_page()
+
+        handlers = {**HANDLERS, Navigate: functools.partial(
+            _do_navigate, wait_until=wait_until)}
+        for step in chain:
+            await handlers[type(step)](page, step, results)
+        succeeded = True
 
     except Exception as e:
-        results.append(f"An error occurred: {str(e)}")
+        results.write(f"An error occurred: {str(e)}\n")
     finally:
-        # This ensures everything closes properly after you manually close the browser.
-        if browser:
-            await browser.close()
-        if playwright:
-            await playwright.stop()
+        if context:
+            await release_context(context)
+
+    return succeeded, results.getvalue()
+
+
+async def execute_playwright_plan(plan, headless=True, blocked_resources=DEFAULT_BLOCKED_RESOURCES,
+                                  wait_until=DEFAULT_WAIT_UNTIL):
+    """
+    Executes the automation plan using Playwright and returns
+    `(succeeded, log)`.
+
+    Independent chains of the plan run concurrently, each in its own context.
+    The completion message is only logged when every chain succeeded.
+    """
+    results = io.StringIO()
+    succeeded = False
+    try:
+        browser = await get_browser(headless)
+        await get_context_pool(browser)
+        chains, end_step = split_plan(plan)
+        chain_results = await asyncio.gather(
+            *(run_chain(browser, chain, blocked_resources, wait_until) for chain in chains))
+        for _, chain_log in chain_results:
+            results.write(chain_log)
+
+        if all(chain_succeeded for chain_succeeded, _ in chain_results):
+            if end_step is not None:
+                results.write(f"Task finished: {end_step.message}\n")
+            results.write("\n✅ Automation finished.")
+            succeeded = True
+
+    except Exception as e:
+        results.write(f"An error occurred: {str(e)}")
 
-    return "\n".join(results)
+    return succeeded, results.getvalue()
 
 # --- Main Controller Logic ---
 
 
-async def brain_orchestrator(user_prompt):
+async def brain_orchestrator(user_prompt, model_name=DEFAULT_MODEL_NAME, headless=True,
+                             blocked_resources=DEFAULT_BLOCKED_RESOURCES, wait_until=DEFAULT_WAIT_UNTIL,
+                             use_plan_cache=True):
     """
     Main function to orchestrate the workflow.
     """
-    model = configure_nlp_module()
-    plan_json_str = generate_automation_plan(model, user_prompt)
-    yield f"Generated Plan:\n{plan_json_str}\n\nExecuting..."
+    plan_json_str = get_cached_plan(model_name, user_prompt) if use_plan_cache else None
+    from_cache = plan_json_str is not None
+    if from_cache:
+        yield f"Cached Plan:\n{plan_json_str}\n\nExecuting..."
+    else:
+        model = configure_nlp_module(model_name)
+        plan_json_str = ""
+        async for chunk in generate_automation_plan(model, user_prompt):
+            plan_json_str += chunk
+            yield f"Generating Plan:\n{plan_json_str}"
+        yield f"Generated Plan:\n{plan_json_str}\n\nExecuting..."
 
     try:
-        plan = json.loads(plan_json_str)
-        execution_result = await execute_playwright_plan(plan)
+        plan = decode_plan(plan_json_str)
+        succeeded, execution_result = await execute_playwright_plan(
+            plan, headless, blocked_resources, wait_until)
+        if succeeded and not from_cache:
+            store_plan(model_name, user_prompt, plan_json_str)
+        elif not succeeded and from_cache:
+            evict_plan(model_name, user_prompt)
         yield execution_result
-    except json.JSONDecodeError:
-        yield f"Error: Could not decode the plan from the LLM. Raw response:\n{plan_json_str}"
+    except msgspec.DecodeError as e:
+        if from_cache:
+            evict_plan(model_name, user_prompt)
+        yield f"Error: Could not decode the plan from the LLM ({e}). Raw response:\n{plan_json_str}"
     except Exception as e:
         yield f"An execution error occurred: {str(e)}"
 
 # --- 3. User Interface & Interaction Module (Gradio) ---
 
-
-# --- 3. User Interface & Interaction Module (Gradio) ---
-def create_ui():
-    """
-    Creates and launches the GitHub dark mode inspired Gradio web interface.
-    """
-    github_css = """
+GITHUB_CSS = """
     body, .gradio-container { background-color: #0d1117; color: #e6edf3; }
     #title h1 { color: #e6edf3; text-align: center; font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Helvetica, Arial, sans-serif; }
     #subtitle p { color: #8b949e; text-align: center; }
@@ -147,10 +659,22 @@ def create_ui():
     .gradio-accordion { background-color: #161b22 !important; border: 1px solid #30363d !important; }
     footer { display: none !important; }
     """
-    theme = gr.themes.Base(font=["-apple-system", "BlinkMacSystemFont",
-                           "Segoe UI", "Helvetica", "Arial", "sans-serif"])
 
-    with gr.Blocks(theme=theme, css=github_css, title="B.R.A.I.N") as interface:
+THEME = gr.themes.Base(font=["-apple-system", "BlinkMacSystemFont",
+                             "Segoe UI", "Helvetica", "Arial", "sans-serif"])
+
+EXAMPLE_COMMANDS = (
+    "Go to amazon.com and search for wireless headphones",
+    "Go to amazon.com, search for 'smartwatch', and extract the title of the first result",
+    "Go to Github and search for the 'gradio' repository",
+)
+
+
+def create_ui():
+    """
+    Creates and launches the GitHub dark mode inspired Gradio web interface.
+    """
+    with gr.Blocks(theme=THEME, css=GITHUB_CSS, title="B.R.A.I.N") as interface:
         gr.Markdown(
             "# B.R.A.I.N - Browser Retrieval and Automation Intelligent Network", elem_id="title")
         gr.Markdown(
@@ -167,16 +691,8 @@ def create_ui():
                 output_display = gr.Textbox(
                     label="Execution Log & Results", lines=15, interactive=False, elem_id="output_display")
 
-                run_button.click(fn=brain_orchestrator,
-                                 inputs=prompt_input, outputs=output_display)
-
                 gr.Examples(
-                    examples=[
-                        "Go to amazon.com and search for wireless headphones",
-                        # <-- This is the new command
-                        "Go to amazon.com, search for 'smartwatch', and extract the title of the first result",
-                        "Go to Github and search for the 'gradio' repository"
-                    ],
+                    examples=list(EXAMPLE_COMMANDS),
                     inputs=prompt_input, label="Example Commands"
                 )
 
@@ -186,9 +702,23 @@ def create_ui():
                     api_key_input = gr.Textbox(
                         label="Gemini API Key", placeholder="Enter your key here...", type="password")
                     model_name_input = gr.Dropdown(label="Model", choices=[
-                                                   'gemini-1.5-flash-latest', 'gemini-1.0-pro-latest'], value='gemini-1.5-flash-latest')
+                                                   'gemini-1.5-flash-latest', 'gemini-1.5-pro-latest'], value=DEFAULT_MODEL_NAME)
                     max_steps_slider = gr.Slider(
                         label="Maximum Automation Steps", minimum=5, maximum=50, step=1, value=25)
+                    headless_checkbox = gr.Checkbox(
+                        label="Headless Browser", info="Untick to watch the browser while debugging.", value=True)
+                    blocked_resources_input = gr.CheckboxGroup(
+                        label="Blocked Resource Types", choices=BLOCKABLE_RESOURCES, value=list(DEFAULT_BLOCKED_RESOURCES),
+                        info="Skipping these speeds up page loads. Keep stylesheets for sites whose selectors depend on layout.")
+                    wait_until_input = gr.Dropdown(
+                        label="Navigation Wait Condition", choices=WAIT_UNTIL_CHOICES, value=DEFAULT_WAIT_UNTIL)
+                    plan_cache_checkbox = gr.Checkbox(
+                        label="Reuse Cached Plans", info="Untick to always ask Gemini for a fresh plan.", value=True)
+
+        run_button.click(fn=brain_orchestrator,
+                         inputs=[prompt_input, model_name_input,
+                                 headless_checkbox, blocked_resources_input, wait_until_input,
+                                 plan_cache_checkbox], outputs=output_display)
 
     interface.launch(share=True)
 